@@ -9,12 +9,18 @@ Strategy:
 4. Output as shapes.txt
 """
 
-import json
 import csv
+import hashlib
+import heapq
 import math
-from collections import defaultdict
+import os
+import pickle
+from collections import Counter, defaultdict
 from pathlib import Path
 
+import ijson
+import numpy as np
+
 # Our GTFS routes - shape_id matches route_id from routes.txt
 # Terminals use stop_id from stops.txt
 ROUTES = {
@@ -59,6 +65,11 @@ ROUTES = {
 # Station coordinates (from our stops.txt)
 STATIONS = {}
 
+# Parsed track graph cache, keyed by a hash of osm_elements.json.
+# Bump the version whenever the filter or graph layout changes.
+CACHE_DIR = Path('cache')
+GRAPH_CACHE_VERSION = 4
+
 def load_stations():
     """Load station coordinates from stops.txt (keyed by stop_id)"""
     with open('gtfs/stops.txt', 'r') as f:
@@ -71,22 +82,26 @@ def load_stations():
             }
     print(f"Loaded {len(STATIONS)} stations")
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points in km"""
+def _haversine_pairs(lat_r, lon_r):
+    """
+    Distances in km between consecutive points of a polyline.
+    Takes latitude/longitude arrays already converted to radians, so each
+    point's radians and cos(lat) are computed once rather than per pair.
+    """
     R = 6371  # Earth radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    cos_lat = np.cos(lat_r)
+    a = np.sin(np.diff(lat_r)/2)**2 + cos_lat[:-1] * cos_lat[1:] * np.sin(np.diff(lon_r)/2)**2
+    c = 2 * np.arcsin(np.sqrt(a))
     return R * c
 
+def cumulative_distance(coords):
+    """Cumulative distance in meters along a polyline of (lat, lon) points"""
+    arr = np.radians(np.asarray(coords, dtype=np.float64))
+    seg = _haversine_pairs(arr[:, 0], arr[:, 1]) * 1000  # Convert to meters
+    return np.concatenate(([0.0], np.cumsum(seg)))
+
 def load_osm_data():
     """Load and filter OSM rail segments"""
-    with open('osm_elements.json', 'r') as f:
-        elements = json.load(f)
-    
-    print(f"\nLoaded {len(elements)} OSM way elements")
-    
     # Filter to main passenger rail
     filtered = []
     excluded_usage = {'military', 'industrial'}
@@ -94,20 +109,33 @@ def load_osm_data():
     
     usage_counts = defaultdict(int)
     service_counts = defaultdict(int)
-    
-    for elem in elements:
-        tags = elem.get('tags', {})
-        usage = tags.get('usage', 'unknown')
-        service = tags.get('service', '')
-        
-        usage_counts[usage] += 1
-        if service:
-            service_counts[service] += 1
-        
-        # Include main lines and branches, exclude service tracks
-        if usage not in excluded_usage and service not in excluded_service:
-            if 'geometry' in elem and len(elem['geometry']) > 0:
-                filtered.append(elem)
+    total = 0
+    
+    # Stream elements one at a time, keeping only those that pass the filter
+    with open('osm_elements.json', 'rb') as f:
+        for elem in ijson.items(f, 'item', use_float=True):
+            total += 1
+            tags = elem.get('tags', {})
+            usage = tags.get('usage', 'unknown')
+            service = tags.get('service', '')
+            
+            usage_counts[usage] += 1
+            if service:
+                service_counts[service] += 1
+            
+            # Include main lines and branches, exclude service tracks
+            if usage not in excluded_usage and service not in excluded_service:
+                if 'geometry' in elem and len(elem['geometry']) > 0:
+                    # Pack the list of {'lat', 'lon'} dicts into an (N, 2)
+                    # float64 array straight away and drop the dicts
+                    geom = elem.pop('geometry')
+                    elem['geometry_arr'] = np.fromiter(
+                        (v for p in geom for v in (p['lat'], p['lon'])),
+                        dtype=np.float64, count=2 * len(geom)
+                    ).reshape(-1, 2)
+                    filtered.append(elem)
+    
+    print(f"\nLoaded {total} OSM way elements")
     
     print(f"\nUsage distribution:")
     for u, c in sorted(usage_counts.items(), key=lambda x: -x[1]):
@@ -123,114 +151,255 @@ def load_osm_data():
 def build_track_graph(segments):
     """
     Build a graph where:
-    - Nodes are track segment endpoints (rounded coordinates)
+    - Nodes are track segment endpoints (rounded coordinates), numbered 0..N-1
     - Edges are the track segments with their geometry
-    """
-    
-    def coord_key(lat, lon, precision=4):
-        """Round coordinates to create joinable keys"""
-        return (round(lat, precision), round(lon, precision))
     
-    # Graph: coord_key -> list of (other_coord_key, segment_id, geometry)
-    graph = defaultdict(list)
-    segment_geoms = {}  # segment_id -> full geometry
+    The adjacency is stored in CSR form: the edges leaving node i are
+    indptr[i]:indptr[i+1] in the neighbors/edge_* arrays.
+    """
     
-    for seg in segments:
+    precision = 4
+    scale = 10 ** precision
+    
+    def coord_keys(points):
+        """
+        Round an (N, 2) array of coordinates to create joinable keys, each
+        packed into a single int so dict hashing/compares work on one
+        machine int, not a float tuple
+        """
+        rounded = np.round(points, precision)
+        lat_i = np.rint(rounded[:, 0] * scale).astype(np.int64) + 90 * scale
+        lon_i = np.rint(rounded[:, 1] * scale).astype(np.int64) + 180 * scale
+        return (lat_i * (360 * scale + 1) + lon_i).tolist(), rounded.tolist()
+    
+    segments = [seg for seg in segments if len(seg['geometry_arr']) >= 2]
+    
+    # Round all segment endpoints in one batch
+    starts = np.array([s['geometry_arr'][0] for s in segments], dtype=np.float64).reshape(-1, 2)
+    ends = np.array([s['geometry_arr'][-1] for s in segments], dtype=np.float64).reshape(-1, 2)
+    start_keys, starts_q = coord_keys(starts)
+    end_keys, ends_q = coord_keys(ends)
+    
+    segment_arrays = {}  # segment_id -> (N, 2) array of (lat, lon)
+    segment_dists = {}  # segment_id -> cumulative distance in m along the segment
+    node_ids = {}  # coord_key -> node id
+    node_coords = []  # node id -> rounded (lat, lon)
+    junctions = []  # node id -> exact (lat, lon) of the first endpoint seen there
+    
+    # Edge list: (src, dst, segment_id, reversed, length_m), both directions
+    src, dst, edge_seg, edge_rev, edge_len = [], [], [], [], []
+    
+    for seg, start_key, end_key, start_q, end_q, start_p, end_p in zip(
+            segments, start_keys, end_keys, starts_q, ends_q, starts, ends):
         seg_id = seg['id']
-        geom = seg['geometry']
-        
-        if len(geom) < 2:
-            continue
-        
-        start = coord_key(geom[0]['lat'], geom[0]['lon'])
-        end = coord_key(geom[-1]['lat'], geom[-1]['lon'])
+        for key, q, p in ((start_key, start_q, start_p), (end_key, end_q, end_p)):
+            if key not in node_ids:
+                node_ids[key] = len(node_coords)
+                node_coords.append(q)
+                junctions.append(p)
+        start, end = node_ids[start_key], node_ids[end_key]
         
-        segment_geoms[seg_id] = geom
+        # Snap both endpoints to their junction so segments meeting at a
+        # node share the exact same end point
+        points = seg['geometry_arr']
+        points[0] = junctions[start]
+        points[-1] = junctions[end]
+        segment_arrays[seg_id] = points
+        segment_dists[seg_id] = cumulative_distance(points)
+        length = segment_dists[seg_id][-1]
         
         # Bidirectional edges
-        graph[start].append((end, seg_id, False))  # False = forward direction
-        graph[end].append((start, seg_id, True))   # True = reverse direction
+        src += [start, end]
+        dst += [end, start]
+        edge_seg += [seg_id, seg_id]
+        edge_rev += [False, True]  # False = forward direction
+        edge_len += [length, length]
+    
+    # Group edges by source node. A stable sort keeps each node's edges in
+    # insertion order.
+    n = len(node_coords)
+    src = np.asarray(src, dtype=np.int32)
+    order = np.argsort(src, kind='stable')
+    graph = {
+        'indptr': np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n)))).astype(np.int32),
+        'neighbors': np.asarray(dst, dtype=np.int32)[order],
+        'edge_seg': np.asarray(edge_seg, dtype=np.int64)[order],
+        'edge_rev': np.asarray(edge_rev, dtype=np.uint8)[order],
+        'edge_len': np.asarray(edge_len, dtype=np.float64)[order],
+    }
+    node_coords = np.asarray(node_coords, dtype=np.float64).reshape(-1, 2)
+    
+    print(f"\nBuilt graph with {n} nodes and {len(segment_arrays)} segments")
+    return graph, segment_arrays, segment_dists, node_coords
+
+def load_track_graph():
+    """
+    Load the track graph, from the binary cache when osm_elements.json
+    is unchanged since the last run, otherwise by parsing and filtering
+    the OSM data and building it from scratch
+    """
+    key = hashlib.md5(Path('osm_elements.json').read_bytes()).hexdigest()[:12]
+    cache_path = CACHE_DIR / f"graph_v{GRAPH_CACHE_VERSION}_{key}.pkl"
+    
+    if cache_path.exists():
+        try:
+            with open(cache_path, 'rb') as f:
+                graph, segment_arrays, segment_dists, node_coords = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, ValueError) as e:
+            print(f"\nIgnoring unreadable graph cache {cache_path}: {e}")
+        else:
+            print(f"\nLoaded cached graph with {len(node_coords)} nodes and {len(segment_arrays)} segments from {cache_path}")
+            return graph, segment_arrays, segment_dists, node_coords
+    
+    segments = load_osm_data()
+    graph, segment_arrays, segment_dists, node_coords = build_track_graph(segments)
+    
+    # Write to a temporary file and rename it into place, so an interrupted
+    # run never leaves a truncated cache behind
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = cache_path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((graph, segment_arrays, segment_dists, node_coords), f, protocol=5)
+    os.replace(tmp_path, cache_path)
     
-    print(f"\nBuilt graph with {len(graph)} nodes and {len(segment_geoms)} segments")
-    return graph, segment_geoms
+    return graph, segment_arrays, segment_dists, node_coords
 
-def find_nearest_node(graph, lat, lon, max_dist_km=10):
+def to_unit_vectors(lat, lon):
+    """Convert lat/lon in degrees to 3D unit vectors on the sphere"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon),
+                     np.cos(lat) * np.sin(lon),
+                     np.sin(lat)], axis=-1)
+
+def build_node_index(node_coords):
+    """
+    Index graph nodes for nearest-neighbour lookups.
+    Returns an (N, 3) array holding one unit vector per node id.
+    """
+    return to_unit_vectors(node_coords[:, 0], node_coords[:, 1])
+
+def find_nearest_node(node_index, lat, lon, max_dist_km=10):
     """Find the graph node nearest to a given coordinate"""
-    best_node = None
-    best_dist = float('inf')
+    R = 6371  # Earth radius in km
     
-    for node in graph.keys():
-        dist = haversine(lat, lon, node[0], node[1])
-        if dist < best_dist:
-            best_dist = dist
-            best_node = node
+    # Chord length is monotonic in great-circle distance, so the nearest
+    # node by chord is the nearest node on the sphere
+    chord = np.linalg.norm(node_index - to_unit_vectors(lat, lon), axis=1)
+    i = int(np.argmin(chord))
+    best_dist = 2 * R * math.asin(min(chord[i] / 2, 1.0))
     
     if best_dist > max_dist_km:
         return None, best_dist
-    return best_node, best_dist
+    return i, best_dist
 
-def find_path_bfs(graph, segment_geoms, start_node, end_node, max_segments=500):
+def dijkstra_from(graph, source):
     """
-    BFS to find path between two nodes.
-    Returns list of (segment_id, reversed) tuples.
+    Single-source Dijkstra over the whole track graph (by track length).
+    Returns (dist, parent_node, parent_edge) lists indexed by node id;
+    unreached nodes have dist inf and parent -1.
     """
-    from collections import deque
-    
-    if start_node == end_node:
-        return []
-    
-    # BFS
-    queue = deque([(start_node, [])])  # (current_node, path_so_far)
-    visited = {start_node}
-    
-    while queue:
-        current, path = queue.popleft()
-        
-        if len(path) > max_segments:
-            continue
+    # Plain lists index faster than NumPy arrays from Python code
+    indptr = graph['indptr'].tolist()
+    neighbors = graph['neighbors'].tolist()
+    edge_len = graph['edge_len'].tolist()
+    n = len(indptr) - 1
+    
+    dist = [float('inf')] * n
+    dist[source] = 0.0
+    parent_node = [-1] * n
+    parent_edge = [-1] * n  # edge index used to reach each node
+    heap = [(0.0, source)]
+    
+    while heap:
+        d, current = heapq.heappop(heap)
+        if d > dist[current]:
+            continue  # Stale queue entry
         
-        for next_node, seg_id, reversed_dir in graph.get(current, []):
-            if next_node in visited:
-                continue
-            
-            new_path = path + [(seg_id, reversed_dir)]
-            
-            if next_node == end_node:
-                return new_path
-            
-            visited.add(next_node)
-            queue.append((next_node, new_path))
+        for e in range(indptr[current], indptr[current + 1]):
+            next_node = neighbors[e]
+            nd = d + edge_len[e]
+            if nd < dist[next_node]:
+                dist[next_node] = nd
+                parent_node[next_node] = current
+                parent_edge[next_node] = e
+                heapq.heappush(heap, (nd, next_node))
+    
+    return dist, parent_node, parent_edge
+
+def tree_path(graph, tree, target, reverse=False):
+    """
+    Read the shortest path from a dijkstra_from() tree's source to target.
+    With reverse=True the path runs from target back to the source.
+    Returns list of (segment_id, reversed) tuples, or None if unreachable.
+    """
+    dist, parent_node, parent_edge = tree
+    if dist[target] == float('inf'):
+        return None  # No path found
+    
+    edge_seg = graph['edge_seg']
+    edge_rev = graph['edge_rev']
+    
+    # Walking parents yields the edges target -> source, i.e. the reverse
+    # route with each segment's direction flipped
+    path = []
+    node = target
+    while parent_node[node] >= 0:
+        e = parent_edge[node]
+        path.append((int(edge_seg[e]), not edge_rev[e]))
+        node = parent_node[node]
+    
+    if not reverse:
+        path = [(seg_id, not reversed_dir) for seg_id, reversed_dir in reversed(path)]
+    return path
+
+def path_to_coordinates(path, segment_arrays):
+    """Convert a path of segments to an (N, 2) array of (lat, lon) coordinates"""
+    parts = [segment_arrays[seg_id][::-1] if reversed_dir else segment_arrays[seg_id]
+             for seg_id, reversed_dir in path]
+    
+    if not parts:
+        return np.empty((0, 2))
     
-    return None  # No path found
+    # Consecutive segments share their snapped junction point, so every
+    # segment after the first drops its first row
+    return np.concatenate([parts[0]] + [points[1:] for points in parts[1:]])
 
-def path_to_coordinates(path, segment_geoms):
-    """Convert a path of segments to a list of coordinates"""
-    coords = []
+def path_distances(path, segment_dists):
+    """
+    Cumulative distance in meters for every point path_to_coordinates()
+    emits, stitched from the per-segment distances computed at graph build
+    """
+    parts = []
+    offset = 0.0
     
     for seg_id, reversed_dir in path:
-        geom = segment_geoms[seg_id]
-        points = [(p['lat'], p['lon']) for p in geom]
-        
+        dists = segment_dists[seg_id]
         if reversed_dir:
-            points = points[::-1]
+            dists = dists[-1] - dists[::-1]
         
-        # Avoid duplicating junction points
-        if coords and points:
-            if coords[-1] == points[0]:
-                points = points[1:]
-        
-        coords.extend(points)
+        # Every segment after the first drops its shared junction point
+        parts.append(dists[1:] + offset if parts else dists + offset)
+        offset += dists[-1]
     
-    return coords
+    if not parts:
+        return np.empty(0)
+    return np.concatenate(parts)
 
 def generate_shapes():
     """Main function to generate shapes.txt"""
     
     load_stations()
-    segments = load_osm_data()
-    graph, segment_geoms = build_track_graph(segments)
+    graph, segment_arrays, segment_dists, node_coords = load_track_graph()
+    node_index = build_node_index(node_coords)
+    
+    shapes = []  # List of (shape_id, coords, cumulative distance in m)
     
-    shapes = []  # List of (shape_id, coords)
+    # Routes share few terminals (Casa-Voyageurs ends 7 of them). Search
+    # from each route's most shared terminal and keep one shortest-path
+    # tree per such hub, so routes with a common hub reuse one search.
+    terminal_counts = Counter(t for r in ROUTES.values() for t in r['terminals'])
+    trees = {}  # hub node id -> dijkstra_from() result
     
     print("\n" + "="*60)
     print("GENERATING ROUTE SHAPES")
@@ -249,58 +418,59 @@ def generate_shapes():
         
         # Find nearest graph nodes
         start_node, start_dist = find_nearest_node(
-            graph, start_station['lat'], start_station['lon']
+            node_index, start_station['lat'], start_station['lon']
         )
         end_node, end_dist = find_nearest_node(
-            graph, end_station['lat'], end_station['lon']
+            node_index, end_station['lat'], end_station['lon']
         )
         
-        print(f"  Start: {terminals[0]} -> node {start_node} ({start_dist:.2f} km)")
-        print(f"  End: {terminals[1]} -> node {end_node} ({end_dist:.2f} km)")
+        start_at = tuple(node_coords[start_node].tolist()) if start_node is not None else None
+        end_at = tuple(node_coords[end_node].tolist()) if end_node is not None else None
+        print(f"  Start: {terminals[0]} -> node {start_at} ({start_dist:.2f} km)")
+        print(f"  End: {terminals[1]} -> node {end_at} ({end_dist:.2f} km)")
         
-        if not start_node or not end_node:
+        if start_node is None or end_node is None:
             print(f"  ERROR: Could not find graph nodes near stations")
             continue
         
         # Find path
-        path = find_path_bfs(graph, segment_geoms, start_node, end_node)
+        hub_first = terminal_counts[terminals[0]] >= terminal_counts[terminals[1]]
+        hub, other = (start_node, end_node) if hub_first else (end_node, start_node)
+        if hub not in trees:
+            trees[hub] = dijkstra_from(graph, hub)
+        path = tree_path(graph, trees[hub], other, reverse=not hub_first)
         
         if not path:
             print(f"  ERROR: No path found between stations")
             continue
         
-        coords = path_to_coordinates(path, segment_geoms)
+        coords = path_to_coordinates(path, segment_arrays)
         print(f"  Found path: {len(path)} segments, {len(coords)} points")
         
-        # Calculate total distance
-        total_dist = 0
-        for i in range(1, len(coords)):
-            total_dist += haversine(coords[i-1][0], coords[i-1][1], 
-                                   coords[i][0], coords[i][1])
-        print(f"  Total distance: {total_dist:.1f} km")
+        # Distance along the shape (reused for shape_dist_traveled)
+        dist_traveled = path_distances(path, segment_dists)
+        print(f"  Total distance: {dist_traveled[-1] / 1000:.1f} km")
         
-        shapes.append((route_id, coords))
+        shapes.append((route_id, coords, dist_traveled))
     
     # Write shapes.txt
     print("\n" + "="*60)
     print("WRITING shapes.txt")
     print("="*60)
     
+    # Format each route's rows in one pass and write them as a single
+    # buffer, keeping csv.writer's default \r\n line terminator
     with open('gtfs/shapes.txt', 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence', 'shape_dist_traveled'])
+        f.write('shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence,shape_dist_traveled\r\n')
         
-        for shape_id, coords in shapes:
-            dist_traveled = 0
-            for i, (lat, lon) in enumerate(coords):
-                if i > 0:
-                    dist_traveled += haversine(
-                        coords[i-1][0], coords[i-1][1], lat, lon
-                    ) * 1000  # Convert to meters
-                
-                writer.writerow([shape_id, f"{lat:.6f}", f"{lon:.6f}", i+1, f"{dist_traveled:.1f}"])
-    
-    print(f"\nWrote {sum(len(c) for _, c in shapes)} shape points for {len(shapes)} routes")
+        for shape_id, coords, dist_traveled in shapes:
+            rows = zip(coords[:, 0].tolist(), coords[:, 1].tolist(), dist_traveled.tolist())
+            f.write(''.join(
+                f"{shape_id},{lat:.6f},{lon:.6f},{i},{dist:.1f}\r\n"
+                for i, (lat, lon, dist) in enumerate(rows, start=1)
+            ))
+    
+    print(f"\nWrote {sum(len(c) for _, c, _ in shapes)} shape points for {len(shapes)} routes")
     
     # Also need to update trips.txt with shape_id
     print("\n" + "="*60)
@@ -5,6 +5,7 @@ Uses ijson for streaming JSON parsing.
 """
 
 import json
+import ijson
 from collections import defaultdict
 
 def get_schema_sample(filepath, max_items=3):
@@ -124,57 +125,18 @@ def count_elements(filepath):
     count = 0
     type_counts = defaultdict(int)
     
-    with open(filepath, 'r') as f:
-        # Skip to elements array
-        in_elements = False
-        bracket_depth = 0
-        current_type = None
-        buffer = ""
-        
-        while True:
-            chunk = f.read(100000)  # 100KB chunks
-            if not chunk:
-                break
-            
-            for char in chunk:
-                if not in_elements:
-                    buffer += char
-                    if '"elements"' in buffer:
-                        in_elements = True
-                        buffer = ""
-                    elif len(buffer) > 20:
-                        buffer = buffer[-15:]
-                else:
-                    if char == '{':
-                        if bracket_depth == 1:  # Starting a new element
-                            count += 1
-                            buffer = "{"
-                        elif bracket_depth > 1:
-                            buffer += char
-                        bracket_depth += 1
-                    elif char == '}':
-                        bracket_depth -= 1
-                        buffer += char
-                        if bracket_depth == 1:  # Finished an element
-                            # Try to extract type
-                            if '"type"' in buffer:
-                                import re
-                                match = re.search(r'"type":\s*"(\w+)"', buffer)
-                                if match:
-                                    type_counts[match.group(1)] += 1
-                            buffer = ""
-                    elif char == '[':
-                        if bracket_depth == 0:
-                            bracket_depth = 1  # Start of elements array
-                        else:
-                            buffer += char
-                    elif char == ']':
-                        if bracket_depth == 1:
-                            break  # End of elements array
-                        else:
-                            buffer += char
-                    elif bracket_depth > 1:
-                        buffer += char
+    # The wrapper keeps the parsed Overpass body under json_data. Walk the
+    # parser events directly so no element objects are ever built.
+    with open(filepath, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix == 'json_data.elements.item' and event == 'start_map':
+                count += 1
+            elif prefix == 'json_data.elements.item.type':
+                type_counts[value] += 1
+    
+    untyped = count - sum(type_counts.values())
+    if untyped:
+        type_counts['unknown'] += untyped
     
     print(f"  Total elements: {count}")
     print(f"  By type:")
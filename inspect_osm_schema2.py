@@ -1,40 +1,84 @@
 #!/usr/bin/env python3
 """
 Inspect OSM Overpass response - handles the wrapped response format.
+Streams elements with ijson rather than loading the whole response.
 """
 
 import json
-import re
+import os
+import sys
+import ijson
 from collections import defaultdict
+from pathlib import Path
 
-def inspect_schema(filepath):
+def track_structure(events, structure):
+    """
+    Pass ijson events through, recording top-level wrapper and body keys
+    and scalar metadata into `structure` on the way.
+    """
+    for prefix, event, value in events:
+        if event == 'map_key':
+            if prefix == '':
+                structure['wrapper_keys'].append(value)
+            elif prefix == 'json_data':
+                structure['body_keys'].append(value)
+        elif prefix in ('status_code', 'json_data.version', 'json_data.generator'):
+            structure[prefix] = value
+        yield prefix, event, value
+
+def inspect_schema(filepath, out_path):
     print("\n" + "#" * 60)
     print("# OSM OVERPASS RESPONSE SCHEMA")
     print("#" * 60)
     
-    with open(filepath, 'r') as f:
-        # Load the wrapper
-        wrapper = json.load(f)
+    structure = {'wrapper_keys': [], 'body_keys': []}
+    type_counts = defaultdict(int)
+    all_tags = defaultdict(set)
+    sample_elements = []
+    count = 0
     
-    print("\n=== WRAPPER STRUCTURE ===")
-    print(f"Keys: {list(wrapper.keys())}")
-    print(f"status_code: {wrapper.get('status_code')}")
+    # Stream elements one at a time. The wrapper keeps the parsed body
+    # (same content as the 'body' JSON string) under json_data, so the
+    # elements can be read straight from the file without loading it.
+    # Each element is written out unwrapped as it passes, to a temporary
+    # file that only replaces out_path once the whole response has parsed.
+    tmp_path = Path(f"{out_path}.tmp")
+    try:
+        with open(filepath, 'rb') as f, open(tmp_path, 'w') as out:
+            events = track_structure(ijson.parse(f, use_float=True), structure)
+            out.write('[')
+            for elem in ijson.items(events, 'json_data.elements.item'):
+                if count:
+                    out.write(', ')
+                out.write(json.dumps(elem))  # dumps uses the C encoder, dump does not
+                count += 1
+                
+                type_counts[elem.get('type', 'unknown')] += 1
+                for k, v in elem.get('tags', {}).items():
+                    all_tags[k].add(v)
+                if len(sample_elements) < 3:
+                    sample_elements.append(elem)
+            out.write(']')
+        
+        if 'json_data' not in structure['wrapper_keys']:
+            raise ValueError(f"{filepath}: response has no json_data")
+        if not count:
+            raise ValueError(f"{filepath}: response has no elements")
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
     
-    # Parse the body (it's a JSON string)
-    body = json.loads(wrapper['body'])
+    print("\n=== WRAPPER STRUCTURE ===")
+    print(f"Keys: {structure['wrapper_keys']}")
+    print(f"status_code: {structure.get('status_code')}")
     
     print("\n=== BODY STRUCTURE ===")
-    print(f"Keys: {list(body.keys())}")
-    print(f"version: {body.get('version')}")
-    print(f"generator: {body.get('generator')}")
-    
-    elements = body.get('elements', [])
-    print(f"\nTotal elements: {len(elements)}")
+    print(f"Keys: {structure['body_keys']}")
+    print(f"version: {structure.get('json_data.version')}")
+    print(f"generator: {structure.get('json_data.generator')}")
     
-    # Count by type
-    type_counts = defaultdict(int)
-    for elem in elements:
-        type_counts[elem.get('type', 'unknown')] += 1
+    print(f"\nTotal elements: {count}")
     
     print("\nBy type:")
     for t, c in sorted(type_counts.items()):
@@ -42,7 +86,7 @@ def inspect_schema(filepath):
     
     # Sample elements
     print("\n=== SAMPLE ELEMENTS ===")
-    for i, elem in enumerate(elements[:3]):
+    for i, elem in enumerate(sample_elements):
         print(f"\n--- Element {i+1} (type: {elem.get('type')}) ---")
         print(f"  id: {elem.get('id')}")
         print(f"  Keys: {list(elem.keys())}")
@@ -71,11 +115,6 @@ def inspect_schema(filepath):
     
     # Check what tags are available
     print("\n=== TAG ANALYSIS ===")
-    all_tags = defaultdict(set)
-    for elem in elements:
-        for k, v in elem.get('tags', {}).items():
-            all_tags[k].add(v)
-    
     print(f"\nUnique tag keys: {len(all_tags)}")
     print("\nKey tags for rail identification:")
     for key in ['railway', 'name', 'ref', 'operator', 'service', 'usage', 'electrified', 'gauge']:
@@ -86,14 +125,17 @@ def inspect_schema(filepath):
             else:
                 print(f"  {key}: {len(vals)} unique values")
     
-    return body, elements
+    return count
 
 
 if __name__ == '__main__':
-    body, elements = inspect_schema('raw_shape_data.json')
+    try:
+        count = inspect_schema('raw_shape_data.json', 'osm_elements.json')
+    except ijson.JSONError as e:
+        sys.exit(f"Error: raw_shape_data.json: {str(e).splitlines()[0]} - osm_elements.json left unchanged")
+    except ValueError as e:
+        sys.exit(f"Error: {e} - osm_elements.json left unchanged")
     
-    # Save just the elements for easier processing
+    # Elements were saved unwrapped for easier processing during the scan
     print("\n=== SAVING UNWRAPPED DATA ===")
-    with open('osm_elements.json', 'w') as f:
-        json.dump(elements, f)
-    print(f"Saved {len(elements)} elements to osm_elements.json")
+    print(f"Saved {count} elements to osm_elements.json")
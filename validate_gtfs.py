@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 """GTFS Validation Script for Rail Maroc"""
 
+import csv
 import os
+import re
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, partial
 from pathlib import Path
 
 # Check required files
@@ -23,213 +28,346 @@ OPTIONAL_FILES = [
     'transfers.txt'
 ]
 
-def check_file_exists(gtfs_dir, filename):
-    """Check if file exists and return line count"""
-    filepath = gtfs_dir / filename
-    if filepath.exists():
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-        return True, len(lines) - 1  # subtract header
-    return False, 0
+# Canonical HH:MM:SS (hours may exceed 24 for overnight trips)
+TIME_RE = re.compile(r'\d+:[0-5]\d:[0-5]\d')
 
-def validate_csv_structure(gtfs_dir, filename):
-    """Validate CSV has consistent column count"""
-    filepath = gtfs_dir / filename
-    if not filepath.exists():
-        return None, "File not found"
-    
-    errors = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    if not lines:
-        return None, "Empty file"
-    
-    header = lines[0].strip().split(',')
+# Errors are recorded as (template, args) and only formatted when shown
+WIDTH_ERROR = "Line {}: Expected {} columns, got {}"
+REF_ERROR = "{} line {}: Unknown {} '{}'"
+COORD_ERROR = "stops.txt line {}: Invalid coordinates - {}"
+BOUNDS_ERROR = "stops.txt: {} {} {} outside Morocco bounds"
+TIME_ERROR = "stop_times.txt line {}: Invalid {} '{}'"
+EMPTY_ERROR = ("Empty file", ())
+TRUNCATED_ERROR = "{}: stopped reporting after {} errors of this kind"
+
+# A hopeless file (e.g. wrong delimiter) fails every row; a check stops
+# running on a file once its error list reaches this size
+MAX_ERRORS = 1000
+
+class ErrorLimitReached(Exception):
+    """Raised by record_error when an error list is full"""
+
+def record_error(errors, error):
+    """Append an error, raising ErrorLimitReached once MAX_ERRORS are held"""
+    errors.append(error)
+    if len(errors) >= MAX_ERRORS:
+        raise ErrorLimitReached(errors)
+
+def count_errors(errors):
+    """Errors in a list, not counting truncation notes, and whether a check stopped at MAX_ERRORS"""
+    notes = sum(1 for template, _ in errors if template is TRUNCATED_ERROR)
+    return len(errors) - notes, notes > 0
+
+def format_error(error):
+    """Render a recorded (template, args) error as a message"""
+    template, args = error
+    return template.format(*args)
+
+# Files at least this big are scanned in a worker process; smaller ones
+# are cheaper to scan inline than to ship to a worker
+PARALLEL_MIN_BYTES = 256 << 10
+
+def worker_pool(paths):
+    """(pool, large paths) for scanning the large files in workers; pool is None without a spare CPU"""
+    large = [path for path in paths if path.stat().st_size >= PARALLEL_MIN_BYTES]
+    spare_cpus = (os.cpu_count() or 1) - 1
+    if not large or not spare_cpus:
+        return None, large
+    return ProcessPoolExecutor(max_workers=min(len(large), spare_cpus)), large
+
+# Referenced files are scanned before the files that point at them, so
+# every id set is complete by the time it is checked against
+SCAN_ORDER = [
+    'agency.txt',
+    'stops.txt',
+    'routes.txt',
+    'calendar.txt',
+    'trips.txt',
+    'stop_times.txt',
+]
+
+def scan_file(filepath, validators):
+    """
+    Read a CSV file once, feeding every non-empty data row to each validator.
+    Validators are factories called with the header and a column -> index
+    dict that return a callback taking (line_num, row). A callback that
+    fills its error list (see MAX_ERRORS) is dropped for the rest of the
+    file; the other callbacks, id collection included, keep running.
+    Returns (header, line count excluding header).
+    """
+    with open(filepath, 'r', buffering=1 << 20, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return None, -1
+        
+        # First occurrence wins, matching header.index()
+        columns = {name: i for i, name in reversed(list(enumerate(header)))}
+        checks = [make_check(header, columns) for make_check in validators]
+        for row in reader:
+            if not row or (len(row) == 1 and not row[0].strip()):
+                continue  # skip empty lines
+            for check in checks:
+                try:
+                    check(reader.line_num, row)
+                except ErrorLimitReached as e:
+                    e.args[0].append((TRUNCATED_ERROR, (filepath.name, MAX_ERRORS)))
+                    checks[checks.index(check)] = skip_row
+    
+    return header, reader.line_num - 1
+
+def skip_row(line_num, row):
+    """Callback standing in for a check whose error list is full"""
+
+def check_width(header, columns, errors):
+    """Validate rows have the same column count as the header"""
     header_count = len(header)
     
-    for i, line in enumerate(lines[1:], start=2):
-        if line.strip():  # skip empty lines
-            cols = line.strip().split(',')
-            if len(cols) != header_count:
-                errors.append(f"Line {i}: Expected {header_count} columns, got {len(cols)}")
-    
-    return header, errors if errors else None
+    def check(line_num, row):
+        if len(row) != header_count:
+            record_error(errors, (WIDTH_ERROR, (line_num, header_count, len(row))))
+    return check
 
-def validate_references(gtfs_dir):
-    """Check referential integrity between files"""
-    errors = []
-    
-    # Load IDs from each file
-    def load_ids(filename, id_column):
-        filepath = gtfs_dir / filename
-        if not filepath.exists():
-            return set()
-        ids = set()
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-        if not lines:
-            return set()
-        header = lines[0].strip().split(',')
-        if id_column not in header:
-            return set()
-        idx = header.index(id_column)
-        for line in lines[1:]:
-            if line.strip():
-                cols = line.strip().split(',')
-                if len(cols) > idx:
-                    ids.add(cols[idx])
-        return ids
-    
-    # Load all IDs
-    agency_ids = load_ids('agency.txt', 'agency_id')
-    stop_ids = load_ids('stops.txt', 'stop_id')
-    route_ids = load_ids('routes.txt', 'route_id')
-    trip_ids = load_ids('trips.txt', 'trip_id')
-    service_ids = load_ids('calendar.txt', 'service_id')
-    
-    # Check routes reference valid agencies
-    with open(gtfs_dir / 'routes.txt', 'r') as f:
-        lines = f.readlines()
-    header = lines[0].strip().split(',')
-    if 'agency_id' in header:
-        idx = header.index('agency_id')
-        for i, line in enumerate(lines[1:], start=2):
-            if line.strip():
-                cols = line.strip().split(',')
-                if len(cols) > idx and cols[idx] not in agency_ids:
-                    errors.append(f"routes.txt line {i}: Unknown agency_id '{cols[idx]}'")
-    
-    # Check trips reference valid routes and services
-    with open(gtfs_dir / 'trips.txt', 'r') as f:
-        lines = f.readlines()
-    header = lines[0].strip().split(',')
-    route_idx = header.index('route_id') if 'route_id' in header else -1
-    service_idx = header.index('service_id') if 'service_id' in header else -1
-    
-    for i, line in enumerate(lines[1:], start=2):
-        if line.strip():
-            cols = line.strip().split(',')
-            if route_idx >= 0 and len(cols) > route_idx:
-                if cols[route_idx] not in route_ids:
-                    errors.append(f"trips.txt line {i}: Unknown route_id '{cols[route_idx]}'")
-            if service_idx >= 0 and len(cols) > service_idx:
-                if cols[service_idx] not in service_ids:
-                    errors.append(f"trips.txt line {i}: Unknown service_id '{cols[service_idx]}'")
-    
-    # Check stop_times reference valid trips and stops
-    with open(gtfs_dir / 'stop_times.txt', 'r') as f:
-        lines = f.readlines()
-    header = lines[0].strip().split(',')
-    trip_idx = header.index('trip_id') if 'trip_id' in header else -1
-    stop_idx = header.index('stop_id') if 'stop_id' in header else -1
-    
-    for i, line in enumerate(lines[1:], start=2):
-        if line.strip():
-            cols = line.strip().split(',')
-            if trip_idx >= 0 and len(cols) > trip_idx:
-                if cols[trip_idx] not in trip_ids:
-                    errors.append(f"stop_times.txt line {i}: Unknown trip_id '{cols[trip_idx]}'")
-            if stop_idx >= 0 and len(cols) > stop_idx:
-                if cols[stop_idx] not in stop_ids:
-                    errors.append(f"stop_times.txt line {i}: Unknown stop_id '{cols[stop_idx]}'")
-    
-    return errors
+def collect_ids(header, columns, column, ids):
+    """Collect the values of an id column"""
+    if column not in columns:
+        return skip_row
+    idx = columns[column]
+    
+    def collect(line_num, row):
+        if len(row) > idx:
+            ids.add(row[idx])
+    return collect
+
+def check_references(header, columns, filename, refs, errors):
+    """
+    Validate id columns only reference known ids.
+    refs is a list of (column, valid_ids); all of them are probed by a
+    single callback so each row costs one call however many columns it has.
+    """
+    probes = [(columns[column], column, valid_ids)
+              for column, valid_ids in refs if column in columns]
+    
+    def check(line_num, row):
+        n = len(row)
+        for idx, column, valid_ids in probes:
+            if n > idx:
+                value = row[idx]
+                if value not in valid_ids:
+                    record_error(errors, (REF_ERROR, (filename, line_num, column, value)))
+    return check
 
-def validate_coordinates(gtfs_dir):
+def check_coordinates(header, columns, errors):
     """Validate stop coordinates are reasonable for Morocco"""
-    errors = []
     # Morocco bounding box (approximate)
     MIN_LAT, MAX_LAT = 27.0, 36.0
     MIN_LON, MAX_LON = -13.0, -1.0
     
-    with open(gtfs_dir / 'stops.txt', 'r') as f:
-        lines = f.readlines()
-    
-    header = lines[0].strip().split(',')
-    lat_idx = header.index('stop_lat') if 'stop_lat' in header else -1
-    lon_idx = header.index('stop_lon') if 'stop_lon' in header else -1
-    name_idx = header.index('stop_name') if 'stop_name' in header else -1
-    
-    for i, line in enumerate(lines[1:], start=2):
-        if line.strip():
-            cols = line.strip().split(',')
-            try:
-                lat = float(cols[lat_idx])
-                lon = float(cols[lon_idx])
-                name = cols[name_idx] if name_idx >= 0 else f"line {i}"
-                
-                if not (MIN_LAT <= lat <= MAX_LAT):
-                    errors.append(f"stops.txt: {name} latitude {lat} outside Morocco bounds")
-                if not (MIN_LON <= lon <= MAX_LON):
-                    errors.append(f"stops.txt: {name} longitude {lon} outside Morocco bounds")
-            except (ValueError, IndexError) as e:
-                errors.append(f"stops.txt line {i}: Invalid coordinates - {e}")
+    lat_idx = columns.get('stop_lat', -1)
+    lon_idx = columns.get('stop_lon', -1)
+    name_idx = columns.get('stop_name', -1)
     
-    return errors
+    def check(line_num, row):
+        try:
+            lat = float(row[lat_idx])
+            lon = float(row[lon_idx])
+        except (ValueError, IndexError) as e:
+            record_error(errors, (COORD_ERROR, (line_num, e)))
+            return
+        
+        # Most stops are in bounds, so only look up the name on failure
+        if MIN_LAT <= lat <= MAX_LAT and MIN_LON <= lon <= MAX_LON:
+            return
+        try:
+            name = row[name_idx] if name_idx >= 0 else f"line {line_num}"
+        except IndexError as e:
+            record_error(errors, (COORD_ERROR, (line_num, e)))
+            return
+        if not (MIN_LAT <= lat <= MAX_LAT):
+            record_error(errors, (BOUNDS_ERROR, (name, 'latitude', lat)))
+        if not (MIN_LON <= lon <= MAX_LON):
+            record_error(errors, (BOUNDS_ERROR, (name, 'longitude', lon)))
+    return check
+
+def validate_time_format(time_str):
+    """Validate HH:MM:SS format (allows >24 hours for overnight)"""
+    parts = time_str.split(':')
+    if len(parts) != 3:
+        return False
+    try:
+        h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
+        return h >= 0 and 0 <= m < 60 and 0 <= s < 60
+    except ValueError:
+        return False
 
-def validate_times(gtfs_dir):
+def check_times(header, columns, errors):
     """Validate time format in stop_times.txt"""
+    arr_idx = columns.get('arrival_time', -1)
+    dep_idx = columns.get('departure_time', -1)
+    is_canonical = TIME_RE.fullmatch
+    
+    def check(line_num, row):
+        # The regex accepts well-formed times in C; anything else falls
+        # back to the lenient parser before being reported
+        if arr_idx >= 0 and len(row) > arr_idx:
+            if not is_canonical(row[arr_idx]) and not validate_time_format(row[arr_idx]):
+                record_error(errors, (TIME_ERROR, (line_num, 'arrival_time', row[arr_idx])))
+        if dep_idx >= 0 and len(row) > dep_idx:
+            if not is_canonical(row[dep_idx]) and not validate_time_format(row[dep_idx]):
+                record_error(errors, (TIME_ERROR, (line_num, 'departure_time', row[dep_idx])))
+    return check
+
+def scan_structure(filepath):
+    """
+    Scan a file with only the column count check.
+    Returns (header, record count, structural errors); module level so it
+    can run in a worker process.
+    """
     errors = []
-    
-    with open(gtfs_dir / 'stop_times.txt', 'r') as f:
-        lines = f.readlines()
-    
-    header = lines[0].strip().split(',')
-    arr_idx = header.index('arrival_time') if 'arrival_time' in header else -1
-    dep_idx = header.index('departure_time') if 'departure_time' in header else -1
-    
-    def validate_time_format(time_str):
-        """Validate HH:MM:SS format (allows >24 hours for overnight)"""
-        parts = time_str.split(':')
-        if len(parts) != 3:
-            return False
-        try:
-            h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-            return h >= 0 and 0 <= m < 60 and 0 <= s < 60
-        except ValueError:
-            return False
-    
-    for i, line in enumerate(lines[1:], start=2):
-        if line.strip():
-            cols = line.strip().split(',')
-            if arr_idx >= 0 and len(cols) > arr_idx:
-                if not validate_time_format(cols[arr_idx]):
-                    errors.append(f"stop_times.txt line {i}: Invalid arrival_time '{cols[arr_idx]}'")
-            if dep_idx >= 0 and len(cols) > dep_idx:
-                if not validate_time_format(cols[dep_idx]):
-                    errors.append(f"stop_times.txt line {i}: Invalid departure_time '{cols[dep_idx]}'")
-    
-    return errors
+    header, count = scan_file(filepath, [partial(check_width, errors=errors)])
+    if header is None:
+        errors.append(EMPTY_ERROR)
+    return header, count, errors
+
+def scan_feed(gtfs_dir):
+    """
+    Scan every present GTFS file exactly once, running the structure,
+    id collection, referential, coordinate and time checks in the same pass.
+    Returns (results, ref_errors, coord_errors, time_errors), where results
+    maps filename -> (header, record count, structural errors).
+    """
+    ids = {name: set() for name in ('agency', 'stop', 'route', 'service', 'trip')}
+    ref_errors = {name: [] for name in ('routes.txt', 'trips.txt', 'stop_times.txt')}
+    coord_errors = []
+    time_errors = []
+    
+    # Extra validators per file, on top of the column count check
+    file_checks = {
+        'agency.txt': [partial(collect_ids, column='agency_id', ids=ids['agency'])],
+        'stops.txt': [partial(collect_ids, column='stop_id', ids=ids['stop']),
+                      partial(check_coordinates, errors=coord_errors)],
+        'routes.txt': [partial(collect_ids, column='route_id', ids=ids['route']),
+                       partial(check_references, filename='routes.txt',
+                               refs=[('agency_id', ids['agency'])],
+                               errors=ref_errors['routes.txt'])],
+        'calendar.txt': [partial(collect_ids, column='service_id', ids=ids['service'])],
+        'trips.txt': [partial(collect_ids, column='trip_id', ids=ids['trip']),
+                      partial(check_references, filename='trips.txt',
+                              refs=[('route_id', ids['route']), ('service_id', ids['service'])],
+                              errors=ref_errors['trips.txt'])],
+        'stop_times.txt': [partial(check_references, filename='stop_times.txt',
+                                   refs=[('trip_id', ids['trip']), ('stop_id', ids['stop'])],
+                                   errors=ref_errors['stop_times.txt']),
+                           partial(check_times, errors=time_errors)],
+    }
+    
+    # Optional files only get the column count check and depend on no
+    # other file, so large ones are scanned in worker processes meanwhile
+    optional = [gtfs_dir / filename for filename in OPTIONAL_FILES
+                if (gtfs_dir / filename).exists()]
+    pool, large = worker_pool(optional)
+    pending = {path: pool.submit(scan_structure, path) for path in large} if pool else {}
+    
+    results = {}
+    try:
+        for filename in SCAN_ORDER:
+            filepath = gtfs_dir / filename
+            if not filepath.exists():
+                continue
+            errors = []
+            validators = [partial(check_width, errors=errors)] + file_checks[filename]
+            header, count = scan_file(filepath, validators)
+            if header is None:
+                errors.append(EMPTY_ERROR)
+            results[filename] = (header, count, errors)
+        
+        for path in optional:
+            results[path.name] = pending[path].result() if path in pending else scan_structure(path)
+    finally:
+        if pool:
+            pool.shutdown()
+    
+    # Report reference errors in the order the files reference each other
+    all_ref_errors = ref_errors['routes.txt'] + ref_errors['trips.txt'] + ref_errors['stop_times.txt']
+    return results, all_ref_errors, coord_errors, time_errors
+
+class GtfsFeed:
+    """
+    A GTFS directory validated lazily: the first result accessed triggers
+    the single scan of every file, later accesses reuse it.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+    
+    @cached_property
+    def _scan(self):
+        return scan_feed(self.path)
+    
+    @property
+    def files(self):
+        """filename -> (header, record count, structural errors) for present files"""
+        return self._scan[0]
+    
+    @property
+    def reference_errors(self):
+        """Unknown id references, in routes -> trips -> stop_times order"""
+        return self._scan[1]
+    
+    @property
+    def coordinate_errors(self):
+        """Unparseable or out-of-Morocco stop coordinates"""
+        return self._scan[2]
+    
+    @property
+    def time_errors(self):
+        """Malformed arrival and departure times in stop_times.txt"""
+        return self._scan[3]
 
 def main():
-    gtfs_dir = Path('gtfs')
+    feed = GtfsFeed('gtfs')
     
     print("="*60)
     print("GTFS VALIDATION REPORT - Rail Maroc")
     print("="*60)
     
-    all_errors = []
+    # Only the per-section counts are needed for the summary, plus the
+    # sections where a check stopped at MAX_ERRORS
+    error_counts = Counter()
+    capped = set()
+    
+    def tally(section, errors):
+        """Add a section's errors to the summary and return its count as shown"""
+        count, cut = count_errors(errors)
+        error_counts[section] += count
+        if cut:
+            capped.add(section)
+            return f"≥{count}"
+        return str(count)
+    
     all_warnings = []
     
+    results = feed.files
+    ref_errors = feed.reference_errors
+    coord_errors = feed.coordinate_errors
+    time_errors = feed.time_errors
+    
     # 1. Check required files
     print("\n[1] REQUIRED FILES CHECK")
     print("-"*40)
     for filename in REQUIRED_FILES:
-        exists, count = check_file_exists(gtfs_dir, filename)
-        if exists:
-            print(f"  ✅ {filename}: {count} records")
+        if filename in results:
+            print(f"  ✅ {filename}: {results[filename][1]} records")
         else:
             print(f"  ❌ {filename}: MISSING")
-            all_errors.append(f"Missing required file: {filename}")
+            error_counts['missing'] += 1
     
     # 2. Check optional files
     print("\n[2] OPTIONAL FILES CHECK")
     print("-"*40)
     for filename in OPTIONAL_FILES:
-        exists, count = check_file_exists(gtfs_dir, filename)
-        if exists:
-            print(f"  ✅ {filename}: {count} records")
+        if filename in results:
+            print(f"  ✅ {filename}: {results[filename][1]} records")
         else:
             print(f"  ⚪ {filename}: not present (optional)")
     
@@ -237,51 +375,44 @@ def main():
     print("\n[3] CSV STRUCTURE VALIDATION")
     print("-"*40)
     for filename in REQUIRED_FILES + OPTIONAL_FILES:
-        if (gtfs_dir / filename).exists():
-            header, errors = validate_csv_structure(gtfs_dir, filename)
+        if filename in results:
+            header, _, errors = results[filename]
             if errors:
-                print(f"  ❌ {filename}: {len(errors)} structural errors")
-                all_errors.extend(errors)
+                print(f"  ❌ {filename}: {tally('structure', errors)} structural errors")
             else:
                 print(f"  ✅ {filename}: Valid structure ({len(header)} columns)")
     
     # 4. Referential integrity
     print("\n[4] REFERENTIAL INTEGRITY")
     print("-"*40)
-    ref_errors = validate_references(gtfs_dir)
     if ref_errors:
-        print(f"  ❌ {len(ref_errors)} reference errors found")
+        print(f"  ❌ {tally('references', ref_errors)} reference errors found")
         for err in ref_errors[:10]:  # Show first 10
-            print(f"     - {err}")
+            print(f"     - {format_error(err)}")
         if len(ref_errors) > 10:
             print(f"     ... and {len(ref_errors) - 10} more")
-        all_errors.extend(ref_errors)
     else:
         print("  ✅ All references valid")
     
     # 5. Coordinate validation
     print("\n[5] COORDINATE VALIDATION (Morocco bounds)")
     print("-"*40)
-    coord_errors = validate_coordinates(gtfs_dir)
     if coord_errors:
-        print(f"  ❌ {len(coord_errors)} coordinate errors")
+        print(f"  ❌ {tally('coordinates', coord_errors)} coordinate errors")
         for err in coord_errors:
-            print(f"     - {err}")
-        all_errors.extend(coord_errors)
+            print(f"     - {format_error(err)}")
     else:
         print("  ✅ All coordinates within Morocco bounds")
     
     # 6. Time format validation
     print("\n[6] TIME FORMAT VALIDATION")
     print("-"*40)
-    time_errors = validate_times(gtfs_dir)
     if time_errors:
-        print(f"  ❌ {len(time_errors)} time format errors")
+        print(f"  ❌ {tally('times', time_errors)} time format errors")
         for err in time_errors[:10]:
-            print(f"     - {err}")
+            print(f"     - {format_error(err)}")
         if len(time_errors) > 10:
             print(f"     ... and {len(time_errors) - 10} more")
-        all_errors.extend(time_errors)
     else:
         print("  ✅ All times in valid HH:MM:SS format")
     
@@ -290,8 +421,9 @@ def main():
     print("VALIDATION SUMMARY")
     print("="*60)
     
-    if all_errors:
-        print(f"\n❌ VALIDATION FAILED: {len(all_errors)} errors found")
+    total_errors = sum(error_counts.values())
+    if total_errors:
+        print(f"\n❌ VALIDATION FAILED: {'≥' if capped else ''}{total_errors} errors found")
         print("\nErrors must be fixed before submission.")
         return 1
     else:
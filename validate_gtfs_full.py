@@ -8,36 +8,215 @@ https://gtfs.org/schedule/reference/
 import csv
 import os
 import re
+import sys
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
+from itertools import islice
+
+from validate_gtfs import worker_pool
+
+# Rows parsed per batch by read_table
+BATCH_ROWS = 1 << 16
+
+def num_rows(table):
+    """Number of rows in a column table returned by read_table"""
+    return len(next(iter(table.values()), ())) if table else 0
+
+def column(table, name, default=''):
+    """Values of a column, or default repeated for every row if it is absent"""
+    values = table.get(name)
+    return values if values is not None else [default] * num_rows(table)
+
+def floats_or_none(values):
+    """Convert a column to floats, with None where a value is not numeric"""
+    try:
+        return list(map(float, values))
+    except ValueError:
+        pass
+    result = []
+    for value in values:
+        try:
+            result.append(float(value))
+        except ValueError:
+            result.append(None)
+    return result
+
+def column_matches(pattern, values):
+    """True if pattern fully matches the newline-joined column (never with embedded newlines)"""
+    joined = '\n'.join(values)
+    return joined.count('\n') == len(values) - 1 and pattern.fullmatch(joined) is not None
+
+def unknown_ids(values, valid_ids):
+    """Distinct non-empty values missing from valid_ids (none if valid_ids is empty)"""
+    if not valid_ids or valid_ids.issuperset(values):
+        return set()
+    unknown = set(values).difference(valid_ids)
+    unknown.discard('')
+    return unknown
+
+def read_table(filepath):
+    """Read a CSV file as a dict of column name -> list of values, with *_id values interned"""
+    # Read in 1 MiB chunks so csv.reader is fed from large buffered reads
+    with open(filepath, 'r', buffering=1 << 20, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return {}
+        
+        width = len(header)
+        # Like DictReader, a repeated column name keeps its last column
+        positions = {name: i for i, name in enumerate(header)}
+        table = {name: [] for name in positions}
+        
+        # Transpose a batch at a time so only one batch of rows is
+        # held alongside the columns
+        while True:
+            rows = list(islice(reader, BATCH_ROWS))
+            if not rows:
+                break
+            batch = [row if len(row) >= width else row + [''] * (width - len(row))
+                     for row in rows if row]
+            if not batch:
+                continue
+            values = list(zip(*batch))
+            for name, i in positions.items():
+                if name.endswith('_id'):
+                    table[name].extend(map(sys.intern, values[i]))
+                else:
+                    table[name].extend(values[i])
+    return table
+
+def scan_shapes(filepath, max_samples):
+    """Check shapes.txt alone; returns (rows, shape ids, points per shape, error samples, counts)"""
+    data = read_table(filepath)
+    
+    required_fields = ['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence']
+    required = [(field, column(data, field)) for field in required_fields]
+    shape_ids = set()
+    shape_points = defaultdict(int)
+    errors = []
+    counts = Counter()
+    
+    def report(msg, *args):
+        counts[msg] += 1
+        if counts[msg] <= max_samples:
+            errors.append((msg, args))
+    
+    rows = zip(column(data, 'shape_id'), column(data, 'shape_pt_lat', 0), column(data, 'shape_pt_lon', 0))
+    for i, (shape_id, lat, lon) in enumerate(rows, 1):
+        for field, values in required:
+            if not values[i - 1].strip():
+                report("Row {}: Missing required field '{}'", i, field)
+        
+        shape_ids.add(shape_id)
+        shape_points[shape_id] += 1
+        
+        # Validate coordinates
+        try:
+            lat = float(lat)
+            lon = float(lon)
+            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+                report("Row {}: Invalid coordinates", i)
+        except ValueError:
+            report("Row {}: Non-numeric coordinates", i)
+    
+    return num_rows(data), shape_ids, dict(shape_points), errors, counts
+
+def lexsort(primary, secondary):
+    """Row indexes sorted by (primary, secondary), stable; primary must be non-negative"""
+    n = len(primary)
+    if not n:
+        return []
+    lo = min(secondary)
+    index_bits = n.bit_length()
+    shift = (max(secondary) - lo).bit_length() + index_bits
+    packed = sorted((p << shift) | ((s - lo) << index_bits) | i
+                    for i, (p, s) in enumerate(zip(primary, secondary)))
+    mask = (1 << index_bits) - 1
+    return [key & mask for key in packed]
 
 class GTFSValidator:
+    _DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+    _DAY_NAMES = tuple(day[:3].capitalize() for day in _DAYS)
+    _DAY_VALUES = frozenset(('0', '1'))
+    
+    # HH:MM:SS, allows >24 for overnight
+    _TIME_RE = re.compile(r'^\d{1,2}:\d{2}:\d{2}$')
+    # A whole column of valid (or empty) times, newline-joined
+    _TIME_COLUMN_RE = re.compile(r'(?:\d{1,2}:[0-5]\d:[0-5]\d)?(?:\n(?:\d{1,2}:[0-5]\d:[0-5]\d)?)*')
+    _DATE_RE = re.compile(r'^\d{8}$')  # YYYYMMDD
+    # A whole column of valid (or empty) dates, newline-joined
+    _DATE_COLUMN_RE = re.compile(r'(?:\d{8})?(?:\n(?:\d{8})?)*')
+    
+    # Valid route types
+    _ROUTE_TYPES = {
+        '0': 'Tram/Light Rail',
+        '1': 'Subway/Metro', 
+        '2': 'Rail',
+        '3': 'Bus',
+        '4': 'Ferry',
+        '5': 'Cable Tram',
+        '6': 'Aerial Lift',
+        '7': 'Funicular',
+        '11': 'Trolleybus',
+        '12': 'Monorail'
+    }
+    
+    # Issues kept per (file, message template); the rest are only counted
+    MAX_SAMPLES = 50
+    
     def __init__(self, gtfs_dir):
         self.gtfs_dir = Path(gtfs_dir)
         self.errors = []
         self.warnings = []
         self.info = []
+        # Occurrences per (file, message template), including unkept ones
+        self.error_counts = Counter()
+        self.warning_counts = Counter()
+        self.info_counts = Counter()
         self.data = {}
+        # Future of scan_shapes when shapes.txt is checked in a worker
+        self._shapes_scan = None
+        
+    # Issues are stored as (file, message template, args) and only
+    # formatted by format_issue when the summary prints them. Each
+    # (file, template) kind keeps its first MAX_SAMPLES issues; later
+    # ones are only counted.
+    def _record(self, issues, counts, file, msg, args):
+        key = (file, msg)
+        counts[key] += 1
+        if counts[key] <= self.MAX_SAMPLES:
+            issues.append((file, msg, args))
+    
+    def add_error(self, file, msg, *args):
+        self._record(self.errors, self.error_counts, file, msg, args)
         
-    def add_error(self, file, msg):
-        self.errors.append(f"ERROR [{file}]: {msg}")
-        
-    def add_warning(self, file, msg):
-        self.warnings.append(f"WARNING [{file}]: {msg}")
+    def add_warning(self, file, msg, *args):
+        self._record(self.warnings, self.warning_counts, file, msg, args)
         
-    def add_info(self, file, msg):
-        self.info.append(f"INFO [{file}]: {msg}")
+    def add_info(self, file, msg, *args):
+        self._record(self.info, self.info_counts, file, msg, args)
+    
+    def print_capped(self, counts, label):
+        """List the issue kinds that went over MAX_SAMPLES"""
+        for (file, msg), count in counts.items():
+            if count > self.MAX_SAMPLES:
+                kind = msg.replace('{}', '…')
+                print(f"   [{file}] {count} {label} of kind \"{kind}\", first {self.MAX_SAMPLES} kept")
+    
+    @staticmethod
+    def format_issue(severity, issue):
+        """Render a stored issue as 'SEVERITY [file]: message'"""
+        file, msg, args = issue
+        return f"{severity} [{file}]: {msg.format(*args) if args else msg}"
     
     def load_csv(self, filename):
-        """Load a CSV file and return list of dicts"""
+        """Load a CSV file as columns (see read_table), or None if it is absent"""
         filepath = self.gtfs_dir / filename
         if not filepath.exists():
             return None
-        
-        with open(filepath, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            return list(reader)
+        return read_table(filepath)
     
     def validate_required_files(self):
         """Check all required GTFS files exist"""
@@ -52,7 +231,7 @@ class GTFSValidator:
             if (self.gtfs_dir / f).exists():
                 data = self.load_csv(f)
                 self.data[f] = data
-                print(f"  ✅ {f} ({len(data)} records)")
+                print(f"  ✅ {f} ({num_rows(data)} records)")
             else:
                 self.add_error(f, "Required file missing")
                 print(f"  ❌ {f} MISSING")
@@ -68,11 +247,11 @@ class GTFSValidator:
             if has_calendar:
                 data = self.load_csv('calendar.txt')
                 self.data['calendar.txt'] = data
-                print(f"  ✅ calendar.txt ({len(data)} records)")
+                print(f"  ✅ calendar.txt ({num_rows(data)} records)")
             if has_calendar_dates:
                 data = self.load_csv('calendar_dates.txt')
                 self.data['calendar_dates.txt'] = data
-                print(f"  ✅ calendar_dates.txt ({len(data)} records)")
+                print(f"  ✅ calendar_dates.txt ({num_rows(data)} records)")
     
     def validate_agency(self):
         """Validate agency.txt"""
@@ -81,31 +260,34 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('agency.txt')
-        if not data:
+        if not num_rows(data):
             return
         
         required_fields = ['agency_name', 'agency_url', 'agency_timezone']
-        
-        for i, row in enumerate(data, 1):
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('agency.txt', f"Row {i}: Missing required field '{field}'")
+        required = [(field, column(data, field)) for field in required_fields]
+        urls = column(data, 'agency_url')
+        timezones = data.get('agency_timezone')
+        
+        for i, url in enumerate(urls, 1):
+            for field, values in required:
+                if not values[i - 1].strip():
+                    self.add_error('agency.txt', "Row {}: Missing required field '{}'", i, field)
             
             # Validate URL format
-            if 'agency_url' in row and row['agency_url']:
-                if not row['agency_url'].startswith(('http://', 'https://')):
-                    self.add_warning('agency.txt', f"Row {i}: agency_url should start with http:// or https://")
+            if url:
+                if not url.startswith(('http://', 'https://')):
+                    self.add_warning('agency.txt', "Row {}: agency_url should start with http:// or https://", i)
             
             # Validate timezone
-            if 'agency_timezone' in row:
-                tz = row['agency_timezone']
+            if timezones is not None:
+                tz = timezones[i - 1]
                 # Basic check - should be like "Africa/Casablanca"
                 if '/' not in tz:
-                    self.add_warning('agency.txt', f"Row {i}: agency_timezone '{tz}' may be invalid")
+                    self.add_warning('agency.txt', "Row {}: agency_timezone '{}' may be invalid", i, tz)
         
-        print(f"  ✅ {len(data)} agency(ies) validated")
-        for row in data:
-            print(f"     - {row.get('agency_name', 'Unknown')}")
+        print(f"  ✅ {num_rows(data)} agency(ies) validated")
+        for name in column(data, 'agency_name', 'Unknown'):
+            print(f"     - {name}")
     
     def validate_stops(self):
         """Validate stops.txt"""
@@ -114,47 +296,57 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('stops.txt')
-        if not data:
+        if not num_rows(data):
             return
         
         required_fields = ['stop_id', 'stop_name', 'stop_lat', 'stop_lon']
-        stop_ids = set()
         
         # Morocco bounding box
         MIN_LAT, MAX_LAT = 27.0, 36.0
         MIN_LON, MAX_LON = -13.0, -1.0
         
+        # Each check runs over whole columns. Problems are collected as
+        # (row, check position, report, message, args) and reported sorted,
+        # so they still come out row by row; the positions follow the order
+        # the checks used to run in within a row.
+        dup_k = len(required_fields)
+        lat_k = dup_k + 1
+        lon_k = lat_k + 1
+        problems = []
+        for k, field in enumerate(required_fields):
+            problems += [(i, k, self.add_error, "Row {}: Missing required field '{}'", (i, field))
+                         for i, value in enumerate(column(data, field), 1) if not value.strip()]
+        
+        # Check for duplicate stop_ids
+        ids = column(data, 'stop_id')
+        stop_ids = set(ids)
+        if len(stop_ids) < len(ids):
+            seen = set()
+            for i, stop_id in enumerate(ids, 1):
+                if stop_id in seen:
+                    problems.append((i, dup_k, self.add_error, "Row {}: Duplicate stop_id '{}'", (i, stop_id)))
+                seen.add(stop_id)
+        
+        # Validate coordinates
+        lats = floats_or_none(column(data, 'stop_lat', 0))
+        lons = floats_or_none(column(data, 'stop_lon', 0))
         coord_issues = 0
-        
-        for i, row in enumerate(data, 1):
-            # Check required fields
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('stops.txt', f"Row {i}: Missing required field '{field}'")
-            
-            # Check for duplicate stop_ids
-            stop_id = row.get('stop_id', '')
-            if stop_id in stop_ids:
-                self.add_error('stops.txt', f"Row {i}: Duplicate stop_id '{stop_id}'")
-            stop_ids.add(stop_id)
-            
-            # Validate coordinates
-            try:
-                lat = float(row.get('stop_lat', 0))
-                lon = float(row.get('stop_lon', 0))
-                
-                if not (MIN_LAT <= lat <= MAX_LAT):
-                    self.add_warning('stops.txt', f"Row {i}: stop_lat {lat} outside Morocco bounds")
-                    coord_issues += 1
-                if not (MIN_LON <= lon <= MAX_LON):
-                    self.add_warning('stops.txt', f"Row {i}: stop_lon {lon} outside Morocco bounds")
-                    coord_issues += 1
-                    
-            except ValueError:
-                self.add_error('stops.txt', f"Row {i}: Invalid coordinate values")
+        for i, (lat, lon) in enumerate(zip(lats, lons), 1):
+            if lat is None or lon is None:
+                problems.append((i, lat_k, self.add_error, "Row {}: Invalid coordinate values", (i,)))
+                continue
+            if not (MIN_LAT <= lat <= MAX_LAT):
+                problems.append((i, lat_k, self.add_warning, "Row {}: stop_lat {} outside Morocco bounds", (i, lat)))
+                coord_issues += 1
+            if not (MIN_LON <= lon <= MAX_LON):
+                problems.append((i, lon_k, self.add_warning, "Row {}: stop_lon {} outside Morocco bounds", (i, lon)))
+                coord_issues += 1
+        
+        for _, _, report, msg, args in sorted(problems, key=lambda p: p[:2]):
+            report('stops.txt', msg, *args)
         
         self.data['stop_ids'] = stop_ids
-        print(f"  ✅ {len(data)} stops validated")
+        print(f"  ✅ {num_rows(data)} stops validated")
         print(f"     - Unique stop IDs: {len(stop_ids)}")
         if coord_issues == 0:
             print(f"     - All coordinates within Morocco bounds")
@@ -168,55 +360,43 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('routes.txt')
-        if not data:
+        if not num_rows(data):
             return
         
         required_fields = ['route_id', 'route_type']
-        route_ids = set()
-        
-        # Valid route types
-        valid_route_types = {
-            '0': 'Tram/Light Rail',
-            '1': 'Subway/Metro', 
-            '2': 'Rail',
-            '3': 'Bus',
-            '4': 'Ferry',
-            '5': 'Cable Tram',
-            '6': 'Aerial Lift',
-            '7': 'Funicular',
-            '11': 'Trolleybus',
-            '12': 'Monorail'
-        }
-        
+        required = [(field, column(data, field)) for field in required_fields]
+        ids = column(data, 'route_id')
+        route_ids = set(ids)
+        # Duplicates are only searched for when the set is short of the column
+        seen = set() if len(route_ids) < len(ids) else None
         route_type_counts = defaultdict(int)
         
-        for i, row in enumerate(data, 1):
+        rows = zip(ids, column(data, 'route_type'),
+                   column(data, 'route_short_name'), column(data, 'route_long_name'))
+        for i, (route_id, route_type, short_name, long_name) in enumerate(rows, 1):
             # Check required fields
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('routes.txt', f"Row {i}: Missing required field '{field}'")
+            for field, values in required:
+                if not values[i - 1].strip():
+                    self.add_error('routes.txt', "Row {}: Missing required field '{}'", i, field)
             
             # Check for duplicate route_ids
-            route_id = row.get('route_id', '')
-            if route_id in route_ids:
-                self.add_error('routes.txt', f"Row {i}: Duplicate route_id '{route_id}'")
-            route_ids.add(route_id)
+            if seen is not None:
+                if route_id in seen:
+                    self.add_error('routes.txt', "Row {}: Duplicate route_id '{}'", i, route_id)
+                seen.add(route_id)
             
             # Validate route_type
-            route_type = row.get('route_type', '')
-            if route_type not in valid_route_types:
-                self.add_warning('routes.txt', f"Row {i}: Unknown route_type '{route_type}'")
+            if route_type not in self._ROUTE_TYPES:
+                self.add_warning('routes.txt', "Row {}: Unknown route_type '{}'", i, route_type)
             else:
-                route_type_counts[valid_route_types[route_type]] += 1
+                route_type_counts[self._ROUTE_TYPES[route_type]] += 1
             
             # Check route has either short_name or long_name
-            short_name = row.get('route_short_name', '').strip()
-            long_name = row.get('route_long_name', '').strip()
-            if not short_name and not long_name:
-                self.add_error('routes.txt', f"Row {i}: Either route_short_name or route_long_name required")
+            if not short_name.strip() and not long_name.strip():
+                self.add_error('routes.txt', "Row {}: Either route_short_name or route_long_name required", i)
         
         self.data['route_ids'] = route_ids
-        print(f"  ✅ {len(data)} routes validated")
+        print(f"  ✅ {num_rows(data)} routes validated")
         for rtype, count in route_type_counts.items():
             print(f"     - {rtype}: {count}")
     
@@ -227,59 +407,66 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('trips.txt')
-        if not data:
+        if not num_rows(data):
             return
         
         required_fields = ['route_id', 'service_id', 'trip_id']
-        trip_ids = set()
+        required = [(field, column(data, field)) for field in required_fields]
+        ids = column(data, 'trip_id')
+        trip_ids = set(ids)
+        # Duplicates are only searched for when the set is short of the column
+        seen = set() if len(trip_ids) < len(ids) else None
         route_ids = self.data.get('route_ids', set())
         service_ids = self.data.get('service_ids', set())
         
         # Collect service_ids from calendar if not already done
         if not service_ids:
-            calendar = self.data.get('calendar.txt', [])
-            service_ids = {row['service_id'] for row in calendar if 'service_id' in row}
+            calendar = self.data.get('calendar.txt') or {}
+            service_ids = set(calendar.get('service_id', ()))
             self.data['service_ids'] = service_ids
         
-        orphan_routes = set()
-        orphan_services = set()
-        
-        for i, row in enumerate(data, 1):
+        for i, trip_id in enumerate(ids, 1):
             # Check required fields
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('trips.txt', f"Row {i}: Missing required field '{field}'")
+            for field, values in required:
+                if not values[i - 1].strip():
+                    self.add_error('trips.txt', "Row {}: Missing required field '{}'", i, field)
             
             # Check for duplicate trip_ids
-            trip_id = row.get('trip_id', '')
-            if trip_id in trip_ids:
-                self.add_error('trips.txt', f"Row {i}: Duplicate trip_id '{trip_id}'")
-            trip_ids.add(trip_id)
-            
-            # Check route_id references
-            route_id = row.get('route_id', '')
-            if route_id and route_ids and route_id not in route_ids:
-                orphan_routes.add(route_id)
-            
-            # Check service_id references
-            service_id = row.get('service_id', '')
-            if service_id and service_ids and service_id not in service_ids:
-                orphan_services.add(service_id)
+            if seen is not None:
+                if trip_id in seen:
+                    self.add_error('trips.txt', "Row {}: Duplicate trip_id '{}'", i, trip_id)
+                seen.add(trip_id)
         
         self.data['trip_ids'] = trip_ids
         
+        # Check route_id and service_id references
+        orphan_routes = unknown_ids(column(data, 'route_id'), route_ids)
+        orphan_services = unknown_ids(column(data, 'service_id'), service_ids)
+        
         if orphan_routes:
             for r in orphan_routes:
-                self.add_error('trips.txt', f"References unknown route_id '{r}'")
+                self.add_error('trips.txt', "References unknown route_id '{}'", r)
         if orphan_services:
             for s in orphan_services:
-                self.add_error('trips.txt', f"References unknown service_id '{s}'")
+                self.add_error('trips.txt', "References unknown service_id '{}'", s)
         
-        print(f"  ✅ {len(data)} trips validated")
+        print(f"  ✅ {num_rows(data)} trips validated")
         print(f"     - Unique trip IDs: {len(trip_ids)}")
         if not orphan_routes and not orphan_services:
             print(f"     - All references valid")
     
+    def _time_issue(self, time_val):
+        """Message template for an invalid stop time, or None if it is valid or empty"""
+        if not time_val:
+            return None
+        if not self._TIME_RE.match(time_val):
+            return "Row {}: Invalid {} format '{}'"
+        parts = time_val.split(':')
+        h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
+        if m >= 60 or s >= 60:
+            return "Row {}: Invalid {} '{}'"
+        return None
+    
     def validate_stop_times(self):
         """Validate stop_times.txt"""
         print("\n" + "="*60)
@@ -287,82 +474,99 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('stop_times.txt')
-        if not data:
+        if not num_rows(data):
             return
         
         required_fields = ['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence']
         trip_ids = self.data.get('trip_ids', set())
         stop_ids = self.data.get('stop_ids', set())
         
-        time_pattern = re.compile(r'^\d{1,2}:\d{2}:\d{2}$')
+        # Columns that pass as a whole skip the per-row time checks
+        arrivals = column(data, 'arrival_time')
+        departures = column(data, 'departure_time')
+        check_arrival = not column_matches(self._TIME_COLUMN_RE, arrivals)
+        check_departure = not column_matches(self._TIME_COLUMN_RE, departures)
+        has_sequence = 'stop_sequence' in data
         
         orphan_trips = set()
         orphan_stops = set()
         time_errors = 0
-        sequence_issues = 0
-        
-        # Group by trip to check sequences
-        trips_stops = defaultdict(list)
         
-        for i, row in enumerate(data, 1):
+        # Trips are ranked by first appearance, which doubles as the
+        # orphan check (once per trip) and the sequence sort key. Valid
+        # stop_sequences go into parallel rank / value / row lists.
+        trip_rank = {}
+        seq_ranks = []
+        seq_values = []
+        seq_rows = []
+        
+        # One sweep over the columns does every per-row check
+        rows = zip(column(data, 'trip_id'), arrivals, departures,
+                   column(data, 'stop_id'), column(data, 'stop_sequence'))
+        for i, row in enumerate(rows, 1):
+            trip_id, arrival, departure, stop_id, seq = row
+            
             # Check required fields
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('stop_times.txt', f"Row {i}: Missing required field '{field}'")
+            for field, value in zip(required_fields, row):
+                if not value.strip():
+                    self.add_error('stop_times.txt', "Row {}: Missing required field '{}'", i, field)
             
             # Validate time format (HH:MM:SS, allows >24 for overnight)
-            for time_field in ['arrival_time', 'departure_time']:
-                time_val = row.get(time_field, '')
-                if time_val and not time_pattern.match(time_val):
-                    self.add_error('stop_times.txt', f"Row {i}: Invalid {time_field} format '{time_val}'")
+            if check_arrival:
+                msg = self._time_issue(arrival)
+                if msg:
+                    self.add_error('stop_times.txt', msg, i, 'arrival_time', arrival)
+                    time_errors += 1
+            if check_departure:
+                msg = self._time_issue(departure)
+                if msg:
+                    self.add_error('stop_times.txt', msg, i, 'departure_time', departure)
                     time_errors += 1
-                elif time_val:
-                    parts = time_val.split(':')
-                    h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-                    if m >= 60 or s >= 60:
-                        self.add_error('stop_times.txt', f"Row {i}: Invalid {time_field} '{time_val}'")
-                        time_errors += 1
             
             # Check references
-            trip_id = row.get('trip_id', '')
-            if trip_id and trip_ids and trip_id not in trip_ids:
-                orphan_trips.add(trip_id)
-            
-            stop_id = row.get('stop_id', '')
+            rank = trip_rank.get(trip_id)
+            if rank is None:
+                rank = trip_rank[trip_id] = len(trip_rank)
+                if trip_id and trip_ids and trip_id not in trip_ids:
+                    orphan_trips.add(trip_id)
             if stop_id and stop_ids and stop_id not in stop_ids:
                 orphan_stops.add(stop_id)
             
             # Collect for sequence validation
             try:
-                seq = int(row.get('stop_sequence', 0))
-                trips_stops[trip_id].append((seq, i))
+                seq_values.append(int(seq) if has_sequence else 0)
+                seq_ranks.append(rank)
+                seq_rows.append(i)
             except ValueError:
-                self.add_error('stop_times.txt', f"Row {i}: Invalid stop_sequence")
+                self.add_error('stop_times.txt', "Row {}: Invalid stop_sequence", i)
         
         # Check sequences are monotonically increasing per trip
-        for trip_id, stops in trips_stops.items():
-            stops.sort(key=lambda x: x[0])
-            prev_seq = -1
-            for seq, row_num in stops:
-                if seq <= prev_seq:
-                    self.add_warning('stop_times.txt', f"Trip {trip_id}: Non-increasing stop_sequence at row {row_num}")
-                    sequence_issues += 1
-                prev_seq = seq
+        sequence_issues = 0
+        trip_names = list(trip_rank)
+        prev_rank, prev_seq = -1, -1
+        for j in lexsort(seq_ranks, seq_values):
+            rank, seq, row_num = seq_ranks[j], seq_values[j], seq_rows[j]
+            if rank != prev_rank:
+                prev_rank, prev_seq = rank, -1
+            if seq <= prev_seq:
+                self.add_warning('stop_times.txt', "Trip {}: Non-increasing stop_sequence at row {}", trip_names[rank], row_num)
+                sequence_issues += 1
+            prev_seq = seq
         
         if orphan_trips:
             for t in list(orphan_trips)[:5]:
-                self.add_error('stop_times.txt', f"References unknown trip_id '{t}'")
+                self.add_error('stop_times.txt', "References unknown trip_id '{}'", t)
             if len(orphan_trips) > 5:
-                self.add_error('stop_times.txt', f"... and {len(orphan_trips) - 5} more orphan trip references")
+                self.add_error('stop_times.txt', "... and {} more orphan trip references", len(orphan_trips) - 5)
         
         if orphan_stops:
             for s in list(orphan_stops)[:5]:
-                self.add_error('stop_times.txt', f"References unknown stop_id '{s}'")
+                self.add_error('stop_times.txt', "References unknown stop_id '{}'", s)
             if len(orphan_stops) > 5:
-                self.add_error('stop_times.txt', f"... and {len(orphan_stops) - 5} more orphan stop references")
+                self.add_error('stop_times.txt', "... and {} more orphan stop references", len(orphan_stops) - 5)
         
-        print(f"  ✅ {len(data)} stop_times validated")
-        print(f"     - Covering {len(trips_stops)} trips")
+        print(f"  ✅ {num_rows(data)} stop_times validated")
+        print(f"     - Covering {len(set(seq_ranks))} trips")
         if time_errors == 0:
             print(f"     - All times in valid HH:MM:SS format")
         if sequence_issues == 0:
@@ -377,51 +581,53 @@ class GTFSValidator:
         print("="*60)
         
         data = self.data.get('calendar.txt')
-        if not data:
+        if not num_rows(data):
             print("  ⚪ calendar.txt not present (using calendar_dates.txt)")
             return
         
-        required_fields = ['service_id', 'monday', 'tuesday', 'wednesday', 'thursday', 
-                          'friday', 'saturday', 'sunday', 'start_date', 'end_date']
-        
-        service_ids = set()
-        date_pattern = re.compile(r'^\d{8}$')  # YYYYMMDD
-        
-        for i, row in enumerate(data, 1):
-            # Check required fields
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('calendar.txt', f"Row {i}: Missing required field '{field}'")
-            
-            service_id = row.get('service_id', '')
-            service_ids.add(service_id)
-            
-            # Validate day fields (0 or 1)
-            for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-                val = row.get(day, '')
-                if val not in ('0', '1'):
-                    self.add_error('calendar.txt', f"Row {i}: {day} must be 0 or 1, got '{val}'")
-            
-            # Validate date format
-            for date_field in ['start_date', 'end_date']:
-                date_val = row.get(date_field, '')
-                if date_val and not date_pattern.match(date_val):
-                    self.add_error('calendar.txt', f"Row {i}: {date_field} must be YYYYMMDD format")
-            
-            # Check end_date >= start_date
-            start = row.get('start_date', '')
-            end = row.get('end_date', '')
-            if start and end and end < start:
-                self.add_warning('calendar.txt', f"Row {i}: end_date before start_date")
+        required_fields = ['service_id', *self._DAYS, 'start_date', 'end_date']
+        days = [(day, column(data, day)) for day in self._DAYS]
+        service_ids = set(column(data, 'service_id'))
+        starts = column(data, 'start_date')
+        ends = column(data, 'end_date')
+        
+        # Problems are merged by row and check position, as in validate_stops
+        date_k = len(required_fields) + len(days)
+        order_k = date_k + 2
+        problems = []
+        for k, field in enumerate(required_fields):
+            problems += [(i, k, self.add_error, "Row {}: Missing required field '{}'", (i, field))
+                         for i, value in enumerate(column(data, field), 1) if not value.strip()]
+        
+        # Validate day fields (0 or 1); a column of only 0s and 1s skips the rows
+        for k, (day, values) in enumerate(days, len(required_fields)):
+            if self._DAY_VALUES.issuperset(values):
+                continue
+            problems += [(i, k, self.add_error, "Row {}: {} must be 0 or 1, got '{}'", (i, day, val))
+                         for i, val in enumerate(values, 1) if val not in self._DAY_VALUES]
+        
+        # Validate date format; a column passing as a whole skips the rows
+        for k, date_field, values in ((date_k, 'start_date', starts), (date_k + 1, 'end_date', ends)):
+            if column_matches(self._DATE_COLUMN_RE, values):
+                continue
+            problems += [(i, k, self.add_error, "Row {}: {} must be YYYYMMDD format", (i, date_field))
+                         for i, date_val in enumerate(values, 1)
+                         if date_val and not self._DATE_RE.match(date_val)]
+        
+        # Check end_date >= start_date. Equal-length YYYYMMDD strings order
+        # exactly like the dates, so no int conversion is needed
+        problems += [(i, order_k, self.add_warning, "Row {}: end_date before start_date", (i,))
+                     for i, (start, end) in enumerate(zip(starts, ends), 1)
+                     if start and end and end < start]
+        
+        for _, _, report, msg, args in sorted(problems, key=lambda p: p[:2]):
+            report('calendar.txt', msg, *args)
         
         self.data['service_ids'] = service_ids
-        print(f"  ✅ {len(data)} service patterns validated")
-        for row in data:
-            days = []
-            for d in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-                if row.get(d) == '1':
-                    days.append(d[:3].capitalize())
-            print(f"     - {row.get('service_id')}: {', '.join(days)}")
+        print(f"  ✅ {num_rows(data)} service patterns validated")
+        for i, service_id in enumerate(column(data, 'service_id', None)):
+            names = [name for name, (_, values) in zip(self._DAY_NAMES, days) if values[i] == '1']
+            print(f"     - {service_id}: {', '.join(names)}")
     
     def validate_shapes(self):
         """Validate shapes.txt (optional but recommended)"""
@@ -435,42 +641,30 @@ class GTFSValidator:
             print("  ⚪ shapes.txt not present (optional)")
             return
         
-        data = self.load_csv('shapes.txt')
-        self.data['shapes.txt'] = data
-        
-        required_fields = ['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence']
-        shape_ids = set()
-        shape_points = defaultdict(int)
-        
-        for i, row in enumerate(data, 1):
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_error('shapes.txt', f"Row {i}: Missing required field '{field}'")
-            
-            shape_id = row.get('shape_id', '')
-            shape_ids.add(shape_id)
-            shape_points[shape_id] += 1
-            
-            # Validate coordinates
-            try:
-                lat = float(row.get('shape_pt_lat', 0))
-                lon = float(row.get('shape_pt_lon', 0))
-                if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                    self.add_error('shapes.txt', f"Row {i}: Invalid coordinates")
-            except ValueError:
-                self.add_error('shapes.txt', f"Row {i}: Non-numeric coordinates")
+        if self._shapes_scan is not None:
+            point_count, shape_ids, shape_points, errors, counts = self._shapes_scan.result()
+        else:
+            point_count, shape_ids, shape_points, errors, counts = scan_shapes(filepath, self.MAX_SAMPLES)
+        # The scan only sends back samples; count the rest of each kind too
+        for msg, args in errors:
+            self.add_error('shapes.txt', msg, *args)
+        for msg, count in counts.items():
+            self.error_counts[('shapes.txt', msg)] += count - min(count, self.MAX_SAMPLES)
         
         self.data['shape_ids'] = shape_ids
         
         # Check that trips reference valid shapes
-        trips = self.data.get('trips.txt', [])
-        trip_shape_ids = {t.get('shape_id', '') for t in trips if t.get('shape_id')}
-        orphan_shapes = trip_shape_ids - shape_ids
+        trips = self.data.get('trips.txt') or {}
+        trip_shape_ids = column(trips, 'shape_id')
+        orphan_shapes = set()
+        if not shape_ids.issuperset(trip_shape_ids):
+            orphan_shapes = set(trip_shape_ids).difference(shape_ids)
+            orphan_shapes.discard('')
         if orphan_shapes:
             for s in orphan_shapes:
-                self.add_error('shapes.txt', f"Trip references unknown shape_id '{s}'")
+                self.add_error('shapes.txt', "Trip references unknown shape_id '{}'", s)
         
-        print(f"  ✅ {len(data)} shape points validated")
+        print(f"  ✅ {point_count} shape points validated")
         print(f"     - {len(shape_ids)} unique shapes")
         for sid, count in sorted(shape_points.items()):
             print(f"       {sid}: {count} points")
@@ -491,18 +685,18 @@ class GTFSValidator:
         self.data['feed_info.txt'] = data
         
         required_fields = ['feed_publisher_name', 'feed_publisher_url', 'feed_lang']
+        required = [(field, column(data, field)) for field in required_fields]
         
-        for i, row in enumerate(data, 1):
-            for field in required_fields:
-                if field not in row or not row[field].strip():
-                    self.add_warning('feed_info.txt', f"Row {i}: Missing recommended field '{field}'")
+        for i in range(1, num_rows(data) + 1):
+            for field, values in required:
+                if not values[i - 1].strip():
+                    self.add_warning('feed_info.txt', "Row {}: Missing recommended field '{}'", i, field)
         
-        if data:
-            row = data[0]
+        if num_rows(data):
             print(f"  ✅ Feed info present")
-            print(f"     - Publisher: {row.get('feed_publisher_name', 'N/A')}")
-            print(f"     - Language: {row.get('feed_lang', 'N/A')}")
-            print(f"     - Version: {row.get('feed_version', 'N/A')}")
+            print(f"     - Publisher: {column(data, 'feed_publisher_name', 'N/A')[0]}")
+            print(f"     - Language: {column(data, 'feed_lang', 'N/A')[0]}")
+            print(f"     - Version: {column(data, 'feed_version', 'N/A')[0]}")
     
     def run_validation(self):
         """Run all validations"""
@@ -511,42 +705,59 @@ class GTFSValidator:
         print("# MobilityData GTFS Spec Compliant")
         print("#"*60)
         
-        self.validate_required_files()
-        self.validate_agency()
-        self.validate_stops()
-        self.validate_routes()
-        self.validate_calendar()  # Must come before trips
-        self.validate_trips()
-        self.validate_stop_times()
-        self.validate_shapes()
-        self.validate_feed_info()
+        # shapes.txt depends on no other file; when it is large and a
+        # spare CPU exists, check it in a worker while the rest runs here
+        shapes = self.gtfs_dir / 'shapes.txt'
+        pool, _ = worker_pool([shapes] if shapes.exists() else [])
+        if pool:
+            self._shapes_scan = pool.submit(scan_shapes, shapes, self.MAX_SAMPLES)
+        
+        try:
+            self.validate_required_files()
+            self.validate_agency()
+            self.validate_stops()
+            self.validate_routes()
+            self.validate_calendar()  # Must come before trips
+            self.validate_trips()
+            self.validate_stop_times()
+            self.validate_shapes()
+            self.validate_feed_info()
+        finally:
+            if pool:
+                pool.shutdown()
+            self._shapes_scan = None
         
         # Summary
         print("\n" + "#"*60)
         print("# VALIDATION SUMMARY")
         print("#"*60)
         
+        error_total = sum(self.error_counts.values())
+        warning_total = sum(self.warning_counts.values())
+        
         if self.errors:
-            print(f"\n❌ ERRORS ({len(self.errors)}):")
+            print(f"\n❌ ERRORS ({error_total}):")
             for err in self.errors[:20]:
-                print(f"   {err}")
-            if len(self.errors) > 20:
-                print(f"   ... and {len(self.errors) - 20} more errors")
+                print(f"   {self.format_issue('ERROR', err)}")
+            if error_total > 20:
+                print(f"   ... and {error_total - 20} more errors")
+            self.print_capped(self.error_counts, 'errors')
         
         if self.warnings:
-            print(f"\n⚠️  WARNINGS ({len(self.warnings)}):")
+            print(f"\n⚠️  WARNINGS ({warning_total}):")
             for warn in self.warnings[:10]:
-                print(f"   {warn}")
-            if len(self.warnings) > 10:
-                print(f"   ... and {len(self.warnings) - 10} more warnings")
+                print(f"   {self.format_issue('WARNING', warn)}")
+            if warning_total > 10:
+                print(f"   ... and {warning_total - 10} more warnings")
+            self.print_capped(self.warning_counts, 'warnings')
         
         print("\n" + "="*60)
         if self.errors:
-            print(f"❌ VALIDATION FAILED: {len(self.errors)} errors, {len(self.warnings)} warnings")
+            print(f"❌ VALIDATION FAILED: {error_total} errors, {warning_total} warnings")
             print("\nFix errors before submitting to Google Transit.")
             return False
         elif self.warnings:
-            print(f"✅ VALIDATION PASSED WITH WARNINGS: {len(self.warnings)} warnings")
+            print(f"✅ VALIDATION PASSED WITH WARNINGS: {warning_total} warnings")
             print("\nFeed is acceptable but consider fixing warnings.")
             return True
         else:
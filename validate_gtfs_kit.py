@@ -2,6 +2,7 @@
 """GTFS Validation using gtfs-kit library"""
 
 import gtfs_kit as gk
+import numpy as np
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
@@ -13,17 +14,37 @@ print("="*60)
 # First, let's zip the GTFS folder
 import zipfile
 import os
+import json
 
 gtfs_dir = Path('gtfs')
 zip_path = Path('oncf_gtfs.zip')
+# Size and mtime of every .txt the zip was built from, and of the zip
+# itself so a zip replaced by a pull or checkout is not trusted
+manifest_path = Path('oncf_gtfs.zip.manifest.json')
+
+def fingerprint(file):
+    return [file.stat().st_size, file.stat().st_mtime_ns]
 
 print("\n[1] Creating GTFS zip file...")
-with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-    for file in gtfs_dir.glob('*.txt'):
-        zipf.write(file, file.name)
-        print(f"  Added: {file.name}")
+txt_files = list(gtfs_dir.glob('*.txt'))
+sources = {file.name: fingerprint(file) for file in txt_files}
+try:
+    manifest = json.loads(manifest_path.read_text())
+    up_to_date = manifest == {'sources': sources, 'zip': fingerprint(zip_path)}
+except (OSError, ValueError):
+    up_to_date = False
 
-print(f"\n  Created: {zip_path} ({zip_path.stat().st_size / 1024:.1f} KB)")
+if up_to_date:
+    # Deflating the feed again would produce the same archive
+    print(f"  Feed unchanged, reusing: {zip_path} ({zip_path.stat().st_size / 1024:.1f} KB)")
+else:
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file in txt_files:
+            zipf.write(file, file.name)
+            print(f"  Added: {file.name}")
+    manifest_path.write_text(json.dumps({'sources': sources, 'zip': fingerprint(zip_path)}))
+    
+    print(f"\n  Created: {zip_path} ({zip_path.stat().st_size / 1024:.1f} KB)")
 
 # Load and validate with gtfs-kit
 print("\n[2] Loading feed with gtfs-kit...")
@@ -59,8 +80,8 @@ try:
         for ptype in problems['type'].unique():
             subset = problems[problems['type'] == ptype]
             print(f"  [{ptype}] {len(subset)} issues")
-            for _, row in subset.head(5).iterrows():
-                print(f"    - {row['message']}")
+            for message in subset['message'].head(5):
+                print(f"    - {message}")
             if len(subset) > 5:
                 print(f"    ... and {len(subset) - 5} more")
             print()
@@ -71,21 +92,23 @@ except Exception as e:
 print("\n[5] ROUTE TYPES")
 print("-"*40)
 route_types = {0: 'Tram', 1: 'Subway', 2: 'Rail', 3: 'Bus', 4: 'Ferry', 5: 'Cable', 6: 'Gondola', 7: 'Funicular'}
-for rt in feed.routes['route_type'].unique():
-    count = len(feed.routes[feed.routes['route_type'] == rt])
+# One counting pass, in order of first appearance like unique()
+for rt, count in feed.routes['route_type'].value_counts(dropna=False, sort=False).items():
     print(f"  {route_types.get(rt, f'Unknown ({rt})')}: {count} routes")
 
 # Check service dates
 print("\n[6] SERVICE CALENDAR")
 print("-"*40)
 if feed.calendar is not None:
-    for _, row in feed.calendar.iterrows():
-        days = []
-        for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-            if row[day] == 1:
-                days.append(day[:3].capitalize())
-        print(f"  {row['service_id']}: {', '.join(days)}")
-        print(f"    Valid: {row['start_date']} to {row['end_date']}")
+    day_columns = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    day_names = np.array([day[:3].capitalize() for day in day_columns])
+    # services x days boolean matrix, built without a Series per row
+    runs_on = feed.calendar[day_columns].to_numpy() == 1
+    calendar = zip(feed.calendar['service_id'], runs_on,
+                   feed.calendar['start_date'], feed.calendar['end_date'])
+    for service_id, days, start_date, end_date in calendar:
+        print(f"  {service_id}: {', '.join(day_names[days])}")
+        print(f"    Valid: {start_date} to {end_date}")
 
 print("\n" + "="*60)
 print("✅ VALIDATION COMPLETE")